@@ -2,11 +2,224 @@
 
 """
 import click
+import csv
+import io
+import itertools
+import os
 import re
 import sys
 from typing import Optional
 from smart_open import open
+import numpy as np
 import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.parquet as pq
+
+try:
+    import re2
+except ImportError:
+    # optional DFA-based regex engine; we fall back to the stdlib
+    # backtracking engine when it isn't installed
+    re2 = None
+
+try:
+    from numba import njit
+except ImportError:
+    # optional JIT compiler; the tag stripper falls back to regex without it
+    njit = None
+
+_HTML_TAG_PATTERN = r"<[^>]*>"
+_HTML_TAG_RE = re.compile(_HTML_TAG_PATTERN)
+_HTML_TAG_RE2 = re2.compile(_HTML_TAG_PATTERN) if re2 is not None else None
+
+if njit is not None:
+
+    @njit(cache=True)
+    def _strip_tags_bytes(buf):
+        """Copy buf dropping everything between '<' and '>' inclusive.
+
+        A two-state automaton over raw utf-8 bytes: tag bytes never contain
+        multi-byte continuation values for '<'/'>', so byte-level scanning is
+        safe. An unterminated '<...' run is copied through untouched, matching
+        what the regex does when it finds no closing '>'.
+        """
+        out = np.empty(buf.shape[0], np.uint8)
+        n = 0
+        tag_start = -1
+        for i in range(buf.shape[0]):
+            b = buf[i]
+            if tag_start >= 0:
+                if b == 62:  # '>'
+                    tag_start = -1
+            elif b == 60:  # '<'
+                tag_start = i
+            else:
+                out[n] = b
+                n += 1
+        if tag_start >= 0:
+            for i in range(tag_start, buf.shape[0]):
+                out[n] = buf[i]
+                n += 1
+        return out[:n]
+
+    def _strip_tags_jit(s):
+        buf = np.frombuffer(s.encode("utf-8"), dtype=np.uint8)
+        return bytes(_strip_tags_bytes(buf)).decode("utf-8")
+
+else:
+    _strip_tags_jit = None
+
+
+def _read(input_file, columns=None):
+    """Lazily scan INPUT_FILE, optionally projecting down to the given columns.
+
+    Returns a Polars LazyFrame so each command only reads the rows and columns
+    its query actually needs.
+    """
+    lf = pl.scan_csv(input_file)
+
+    if columns is not None:
+        lf = lf.select(columns)
+
+    return lf
+
+
+def _load(path, usecols=None):
+    """Load PATH into pandas with Arrow-backed dtypes.
+
+    String columns land as Arrow arrays instead of per-row Python objects, so
+    isin/str/value_counts style operations run in Arrow's vectorized kernels.
+    usecols pushes column pruning down into the parser so we never tokenize
+    data a command doesn't need.
+    """
+    # opt-in parquet sidecar so repeated commands on the same file skip the
+    # CSV parse entirely; guarded by env var to avoid surprising users with
+    # extra files next to their data
+    cache = path + ".lw.parquet" if os.environ.get("LW_CACHE") == "1" else None
+
+    if cache and os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        return pd.read_parquet(cache, columns=usecols, dtype_backend="pyarrow")
+
+    try:
+        table = pa.csv.read_csv(
+            path,
+            read_options=pa.csv.ReadOptions(use_threads=True, block_size=32 << 20),
+            convert_options=pa.csv.ConvertOptions(
+                # empty fields become null, as pd.read_csv and polars do
+                strings_can_be_null=True,
+                # on a cache miss parse every column so the sidecar is complete
+                include_columns=usecols if usecols and not cache else None,
+            ),
+        )
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    except pa.ArrowInvalid:
+        # unusual quoting/escaping the Arrow tokenizer rejects
+        df = pd.read_csv(path, usecols=None if cache else usecols, dtype_backend="pyarrow")
+
+    if cache:
+        df.to_parquet(cache, compression="zstd", index=False)
+        if usecols is not None:
+            df = df[usecols]
+
+    return df
+
+
+def _isin_codes(series, values):
+    """Element-wise isin for a categorical Series, comparing integer codes.
+
+    Looks the target values up in the category index once, then runs np.isin
+    over the code array - integer comparisons instead of hashing one string
+    per row.
+    """
+    target = series.cat.categories.get_indexer(list(values))
+    target = target[target >= 0]
+    return np.isin(series.cat.codes.to_numpy(), target)
+
+
+def _write(df, path, fmt):
+    """Write a pandas DataFrame to path in the chosen output format.
+
+    Parquet and Arrow IPC are columnar binary formats that skip the text
+    encoding CSV needs, so they are much quicker to write and re-read.
+    """
+    if fmt == "parquet":
+        df.to_parquet(path, engine="pyarrow", compression="zstd", index=False)
+    elif fmt == "arrow":
+        df.to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+
+
+def _sink(lf, path, fmt):
+    """Stream a Polars LazyFrame to path in the chosen output format"""
+    if fmt == "parquet":
+        lf.sink_parquet(path, compression="zstd")
+    elif fmt == "arrow":
+        lf.sink_ipc(path)
+    else:
+        lf.sink_csv(path)
+
+
+def _stream_transform(input_file, output_file, fn, fmt="csv", chunksize=100_000):
+    """Stream INPUT_FILE through fn one chunk at a time, appending each result
+    to OUTPUT_FILE so only a single chunk is ever resident in memory.
+
+    fn receives a DataFrame chunk and returns the (possibly filtered) chunk to
+    write out.
+    """
+    if fmt == "csv":
+        first = True
+
+        for chunk in pd.read_csv(input_file, chunksize=chunksize):
+            out = fn(chunk)
+            out.to_csv(output_file, mode="w" if first else "a", header=first, index=False)
+            first = False
+
+        return
+
+    # parquet/arrow need a single writer that appends record batches
+    writer = None
+    schema = None
+
+    for chunk in pd.read_csv(input_file, chunksize=chunksize):
+        table = pa.Table.from_pandas(fn(chunk), preserve_index=False)
+
+        if writer is None:
+            schema = table.schema
+            if fmt == "parquet":
+                writer = pq.ParquetWriter(output_file, schema, compression="zstd")
+            else:
+                writer = pa.ipc.new_file(output_file, schema)
+        else:
+            # guard against per-chunk dtype inference drift
+            table = table.cast(schema)
+
+        writer.write_table(table)
+
+    if writer is not None:
+        writer.close()
+
+
+def _csv_columns(input_file):
+    """Read just the header row of INPUT_FILE and return the column names"""
+    return list(pd.read_csv(input_file, nrows=0).columns)
+
+
+engine_option = click.option(
+    "--engine",
+    type=click.Choice(["pandas", "polars"]),
+    default="polars",
+    help="Dataframe engine used to read and transform the CSV",
+)
+
+output_format_option = click.option(
+    "--output-format",
+    type=click.Choice(["csv", "parquet", "arrow"]),
+    default="csv",
+    help="File format to write the output in",
+)
 
 
 @click.group()
@@ -16,86 +229,223 @@ def cli():
 @cli.command()
 @click.argument("input_file", type=click.Path(file_okay=True))
 @click.option("-n", type=int, default=10, help="Number of lines to show")
-def head(input_file, n):
+@engine_option
+def head(input_file, n, engine):
     """Show the top N records for INPUT_FILE"""
-    df = pd.read_csv(input_file)
 
-    print(df.head(n))
+    if engine == "polars":
+        print(_read(input_file).head(n).collect().to_pandas())
+        return
+
+    # read just the header plus n records; csv.reader tracks quoting, so a
+    # field with an embedded newline can't split a record the way slicing
+    # physical lines would. smart_open means this also works for
+    # remote/compressed inputs without fetching the whole object
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+
+    with open(input_file) as f:
+        for row in itertools.islice(csv.reader(f), n + 1):
+            writer.writerow(row)
+
+    df = pd.read_csv(io.StringIO(buf.getvalue()), dtype_backend="pyarrow")
+
+    print(df)
 
 @cli.command()
 @click.argument("input_file", type=click.Path(file_okay=True))
 @click.argument("output_file", type=click.Path(file_okay=True))
 @click.option("--column", type=str, required=True)
-def strip_html(input_file, output_file, column):
+@engine_option
+@output_format_option
+def strip_html(input_file, output_file, column, engine, output_format):
     """Strip HTML tags from given column and save output file"""
 
-    df = pd.read_csv(input_file)
+    if engine == "polars":
+        lf = _read(input_file)
+        columns = lf.collect_schema().names()
 
-    if column not in df.columns:
-        print(f"Column {column} not in dataframe. Valid options are: {list(df.columns)}")
-        return 1
+        if column not in columns:
+            print(f"Column {column} not in dataframe. Valid options are: {columns}")
+            return 1
+
+        _sink(
+            lf.with_columns(pl.col(column).str.replace_all(_HTML_TAG_PATTERN, "")),
+            output_file, output_format,
+        )
+        return
 
-    clean = re.compile('<.*?>')
-    clean_lmb = lambda x: re.sub(clean,'', x)
+    columns = _csv_columns(input_file)
+
+    if column not in columns:
+        print(f"Column {column} not in dataframe. Valid options are: {columns}")
+        return 1
 
-    df[column] = df[column].apply(clean_lmb)
+    def strip_chunk(chunk):
+        if _strip_tags_jit is not None:
+            # pass missing values (NaN) through untouched like the
+            # str.replace fallback does
+            chunk[column] = [
+                _strip_tags_jit(s) if isinstance(s, str) else s
+                for s in chunk[column]
+            ]
+        elif _HTML_TAG_RE2 is not None:
+            sub = _HTML_TAG_RE2.sub
+            chunk[column] = [
+                sub("", s) if isinstance(s, str) else s
+                for s in chunk[column]
+            ]
+        else:
+            chunk[column] = chunk[column].astype("string").str.replace(
+                _HTML_TAG_RE, "", regex=True)
+        return chunk
+
+    _stream_transform(input_file, output_file, strip_chunk, fmt=output_format)
 
-    df.to_csv(output_file)
-    
 @cli.command()
 @click.argument("input_file", type=click.Path(file_okay=True))
 @click.argument("output_file", type=click.Path(file_okay=True))
 @click.option("--columns", type=str, required=True)
-def deduplicate(input_file, output_file, columns):
+@engine_option
+@output_format_option
+def deduplicate(input_file, output_file, columns, engine, output_format):
     """De-duplicate rows in CSV based on columns specified (comma separated)"""
 
-    df = pd.read_csv(input_file)
-
     columns = [x.strip() for x in columns.split(",")]
 
     if len(columns) < 1:
         print("No columns specified")
 
+    if engine == "polars":
+        lf = _read(input_file)
+        available = lf.collect_schema().names()
+        colset = set(available)
+
+        all_ok = True
+        for column in columns:
+            if column not in colset:
+                print(f"Could not find specified column {column} in table")
+                all_ok = False
+
+        if not all_ok:
+            print(f"One or more columns not found in table. Options are {available}")
+            sys.exit(1)
+
+        print(f"Dropping duplicate entries based on column subset{columns}")
+        _sink(
+            lf.unique(subset=columns, keep="first", maintain_order=True),
+            output_file, output_format,
+        )
+        return
+
+    available = _csv_columns(input_file)
+    colset = set(available)
+
     all_ok = True
     for column in columns:
-        if column not in df.columns:
+        if column not in colset:
             print(f"Could not find specified column {column} in table")
             all_ok = False
 
     if not all_ok:
-        print(f"One or more columns not found in table. Options are {list(df.columns)}")
+        print(f"One or more columns not found in table. Options are {available}")
         sys.exit(1)
 
     print(f"Dropping duplicate entries based on column subset{columns}")
-    df.drop_duplicates(subset=columns, inplace=True)
 
-    df.to_csv(output_file)
-        
+    if output_format == "csv":
+        # csv-to-csv can skip the dataframe layer entirely: stream raw rows
+        # and keep only a 64-bit hash per distinct key, so peak memory is
+        # O(distinct keys * 8 bytes) rather than the full frame
+        seen = set()
+
+        with open(input_file) as src, open(output_file, "w") as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst, lineterminator="\n")
+
+            header = next(reader)
+            idx = [header.index(c) for c in columns]
+            writer.writerow(header)
+
+            for row in reader:
+                h = hash(tuple(row[i] for i in idx))
+                if h not in seen:
+                    seen.add(h)
+                    writer.writerow(row)
+
+        return
+
+    seen = set()
+
+    def drop_seen(chunk):
+        mask = []
+        for key in zip(*(chunk[c] for c in columns)):
+            if key in seen:
+                mask.append(False)
+            else:
+                seen.add(key)
+                mask.append(True)
+        return chunk[mask]
+
+    _stream_transform(input_file, output_file, drop_seen, fmt=output_format)
+
 
 @cli.command()
 @click.argument("input_file", type=click.Path(file_okay=True))
 @click.option("--label-column", type=str, default=None, help="name of column containing label", required=True)
-def stat(input_file, label_column):
+@engine_option
+def stat(input_file, label_column, engine):
     """Show top level stats for labels in INPUT_FILE"""
-    df = pd.read_csv(input_file)
+
+    if engine == "polars":
+        counts = _read(input_file, columns=[label_column]).collect()
+        print(counts[label_column].value_counts(sort=True))
+        return
+
+    df = _load(input_file, usecols=[label_column])
+
+    # integer category codes hash/compare far quicker than strings
+    df[label_column] = df[label_column].astype("category")
+
     print(df[label_column].value_counts())
 
 @cli.command()
 @click.argument("input_file", type=click.Path(file_okay=True))
 @click.argument("output_file", type=click.Path(file_okay=True))
 @click.option("--columns", type=str, default=None, help="comma separated list of columns to check for na", required=True)
-def dropna(input_file, output_file,  columns):
+@engine_option
+@output_format_option
+def dropna(input_file, output_file,  columns, engine, output_format):
     """Drop rows where a None/NA value appears in one of columns"""
 
+    if engine == "polars":
+        cols = columns.split(',')
+        lf = _read(input_file)
+
+        stats = lf.select(
+            pl.len().alias("total"),
+            pl.all_horizontal([pl.col(c).is_not_null() for c in cols]).sum().alias("kept"),
+        ).collect()
+
+        print(f"Removing {stats['total'][0] - stats['kept'][0]} columns from dataset")
+
+        _sink(lf.drop_nulls(subset=cols), output_file, output_format)
+        return
+
     print(f"Load dataframe from {input_file}")
 
-    df = pd.read_csv(input_file)
+    cols = columns.split(',')
+    removed = 0
 
-    after_drop = df.dropna(subset=columns.split(','))
+    def drop_na_rows(chunk):
+        nonlocal removed
+        kept = chunk.dropna(subset=cols)
+        removed += len(chunk) - len(kept)
+        return kept
 
-    print(f"Removing {len(df) - len(after_drop)} columns from dataset")
+    _stream_transform(input_file, output_file, drop_na_rows, fmt=output_format)
 
-    after_drop.to_csv(output_file)
+    print(f"Removing {removed} columns from dataset")
 
 
 
@@ -104,35 +454,88 @@ def dropna(input_file, output_file,  columns):
 @click.argument("output_file", type=click.Path(file_okay=True))
 @click.option("--label-column", type=str, default=None, help="name of column containing label", required=True)
 @click.option("--remove-list", type=str, default=None, help="comma separated labels to remove", required=True)
-def remove(input_file, output_file,  label_column, remove_list):
+@engine_option
+@output_format_option
+def remove(input_file, output_file,  label_column, remove_list, engine, output_format):
     """Remove REMOVE_LIST labels from given INPUT_FILE and output to OUTPUT_FILE
-    
-    Takes CSV-like file at INPUT_FILE and removes any row where the label in LABEL-COLUMN 
+
+    Takes CSV-like file at INPUT_FILE and removes any row where the label in LABEL-COLUMN
     has a value matching the REMOVE-LIST.
     """
 
+    if engine == "polars":
+        lf = _read(input_file)
+        columns = lf.collect_schema().names()
+
+        print(f"Checking that label column '{label_column}' exists")
+
+        if label_column not in columns:
+            print(f"No such column {label_column}. Valid options for this CSV are: {columns}")
+            return 1
+
+        print("Checking remove list")
+
+        remove_labels = [x.strip() for x in remove_list.split(",")]
+
+        # one counting scan serves both the removed counts and the
+        # post-removal distribution
+        counts = (
+            lf.select(pl.col(label_column).value_counts(sort=True))
+            .collect()
+            .unnest(label_column)
+        )
+        counts_map = dict(counts.iter_rows())
+
+        for lbl in remove_labels:
+            print(f"Found {counts_map.get(lbl, 0)} rows where df[{label_column}]={lbl}")
+
+        print("Removing data")
+        # fill_null keeps rows with a missing label: is_in is null for null
+        # labels and filter would otherwise silently drop them
+        not_removed = pl.col(label_column).is_in(remove_labels).not_().fill_null(True)
+        kept = lf.filter(not_removed)
+
+        print("New distribution of labels:")
+        print(counts.filter(not_removed))
+
+        _sink(kept, output_file, output_format)
+        return
+
     print(f"Load dataframe from {input_file}")
 
-    df = pd.read_csv(input_file)
+    columns = _csv_columns(input_file)
 
     print(f"Checking that label column '{label_column}' exists")
 
-    if label_column not in df.columns:
-        print(f"No such column {label_column}. Valid options for this CSV are: {df.columns}")
+    if label_column not in columns:
+        print(f"No such column {label_column}. Valid options for this CSV are: {columns}")
         return 1
 
-    print("Checking remove list")
+    remove_labels = [x.strip() for x in remove_list.split(",")]
+    remove_set = set(remove_labels)
 
-    for lbl in remove_list.split(","):
-        print(f"Found {len(df[df[label_column] == lbl])} rows where df[{label_column}]={lbl}")
+    removed_counts = pd.Series(dtype="int64")
+    kept_counts = pd.Series(dtype="int64")
 
     print("Removing data")
-    df= df[~df[label_column].isin(remove_list.split(","))]
 
-    print("New distribution of labels:")
-    print(df[label_column].value_counts())
+    def drop_labels(chunk):
+        nonlocal removed_counts, kept_counts
+        matches = chunk[label_column].isin(remove_set)
+        removed_counts = removed_counts.add(
+            chunk.loc[matches, label_column].value_counts(), fill_value=0)
+        kept = chunk[~matches]
+        kept_counts = kept_counts.add(
+            kept[label_column].value_counts(), fill_value=0)
+        return kept
+
+    _stream_transform(input_file, output_file, drop_labels, fmt=output_format)
 
-    df.to_csv(output_file)
+    for lbl in remove_labels:
+        print(f"Found {int(removed_counts.get(lbl, 0))} rows where df[{label_column}]={lbl}")
+
+    print("New distribution of labels:")
+    print(kept_counts.astype("int64").sort_values(ascending=False))
 
 @cli.command()
 @click.argument("input_file", type=click.Path(file_okay=True))
@@ -141,7 +544,9 @@ def remove(input_file, output_file,  label_column, remove_list):
 @click.option("--include-list", type=str, default=None, help="comma separated labels to merge")
 @click.option("--maximum", type=int, required=True, help="Integer maximum to downsample to")
 @click.option("--random-state",type=int, default=42, help="Random seed to sample against")
-def random_downsample(input_file, output_file, label_column, include_list, maximum, random_state):
+@engine_option
+@output_format_option
+def random_downsample(input_file, output_file, label_column, include_list, maximum, random_state, engine, output_format):
     """Randomly undersample examples from INPU_TFILE with labels in include-list and write new sample to OUTPUT_FILE"""
 
     include = include_list.split(",") if include_list is not None else []
@@ -150,26 +555,66 @@ def random_downsample(input_file, output_file, label_column, include_list, maxim
         print("You must provide at least one label to downsample")
         return 1
 
+    if engine == "polars":
+        # sampling needs the full frame in memory, so collect here
+        df = _read(input_file).collect()
+
+        print("Check label column exists")
+        if label_column not in df.columns:
+            print(f"Could not find label column. Valid columns are {df.columns}")
+            return 1
+
+        for lbl in include:
+            matching = df.filter(pl.col(label_column) == lbl)
+            print(f"Found {len(matching)} examples for label={lbl}, downsampling...")
+            # labels with fewer than `maximum` rows are kept whole, matching
+            # the pandas path
+            sample = matching.sample(min(maximum, len(matching)), seed=random_state)
+            # ne_missing treats null labels as "not this label" so they
+            # survive the rebuild instead of being dropped by a null mask
+            df = pl.concat([df.filter(pl.col(label_column).ne_missing(lbl)), sample])
+
+            print(f"After sampling there are now  {len(sample)} examples for label={lbl}")
+
+        print(f"Saving updated labels to {output_file}")
+        _sink(df.lazy(), output_file, output_format)
+        return
+
     print(f"Load dataframe from {input_file}")
 
-    df = pd.read_csv(input_file)
+    df = _load(input_file)
 
     print("Check label column exists")
     if label_column not in df.columns:
         print(f"Could not find label column. Valid columns are {df.columns}")
         return 1
 
+    df[label_column] = df[label_column].astype("category")
+
+    mask = _isin_codes(df[label_column], include)
+    found = df.loc[mask, label_column].value_counts()
+
     for lbl in include:
-        print(f"Found {len(df[df[label_column] == lbl])} examples for label={lbl}, downsampling...")
-        sample = df[df[label_column] == lbl].sample(maximum, random_state=random_state)
-        df = df[df[label_column] != lbl]
-        df = df.append(sample)
+        print(f"Found {found.get(lbl, 0)} examples for label={lbl}, downsampling...")
 
-        print(f"After sampling there are now  {len(df[df[label_column] == lbl])} examples for label={lbl}")
+    # shuffle once then keep the first `maximum` rows per label
+    sampled = (
+        df[mask]
+        .sample(frac=1, random_state=random_state)
+        .groupby(label_column, group_keys=False)
+        .head(maximum)
+    )
+    df = pd.concat([df[~mask], sampled], ignore_index=True)
 
+    # sampled holds exactly the downsampled rows, so one value_counts gives
+    # every per-label total without re-scanning the frame per label
+    after = sampled[label_column].value_counts()
+
+    for lbl in include:
+        print(f"After sampling there are now  {after.get(lbl, 0)} examples for label={lbl}")
 
     print(f"Saving updated labels to {output_file}")
-    df.to_csv(output_file)
+    _write(df, output_file, output_format)
 
 
 @cli.command()
@@ -179,7 +624,9 @@ def random_downsample(input_file, output_file, label_column, include_list, maxim
 @click.option("--include-list", type=str, default=None, help="comma separated labels to merge")
 @click.option("--exclude-list", type=str, default=None, help="comma separated labels to exclude from merge")
 @click.option("--new-label-name", type=str, required=True, help="Name for new merged label")
-def merge(input_file, output_file,  label_column, include_list, exclude_list, new_label_name):
+@engine_option
+@output_format_option
+def merge(input_file, output_file,  label_column, include_list, exclude_list, new_label_name, engine, output_format):
     """Merge labels according to include and exclude lists.
 
     Take CSV-like file at INPUT_FILE and use include/exclude list to rewrite so that
@@ -198,20 +645,65 @@ def merge(input_file, output_file,  label_column, include_list, exclude_list, ne
         print("You must provide at least one column to include or exclude in your merge.")
         return 1
 
+    if engine == "polars":
+        lf = _read(input_file)
+        columns = lf.collect_schema().names()
+
+        print("Check label column exists")
+        if label_column not in columns:
+            print(f"Could not find label column. Valid columns are {columns}")
+            return 1
+
+        print("Check include/exclude labels exist")
+
+        missing = 0
+        labels = set(lf.select(pl.col(label_column).unique()).collect()[label_column].to_list())
+
+        for lbl in set(include + exclude):
+            if lbl not in labels:
+                print(f"Could not find column {lbl} in dataframe.")
+                missing += 1
+
+        if missing > 0:
+            print("Exiting early due to missing columns from include/exclude filter")
+            print(f"Columns in CSV are: {columns}")
+            return 1
+
+        if len(include) > 0 and len(exclude) > 0:
+            cond = pl.col(label_column).is_in(include) & ~pl.col(label_column).is_in(exclude)
+        elif len(exclude) > 0:
+            cond = ~pl.col(label_column).is_in(exclude)
+        elif len(include) > 0:
+            cond = pl.col(label_column).is_in(include)
+
+        print(f"Saving updated labels to {output_file}")
+        _sink(
+            lf.with_columns(
+                pl.when(cond)
+                .then(pl.lit(new_label_name))
+                .otherwise(pl.col(label_column))
+                .alias(label_column)
+            ),
+            output_file, output_format,
+        )
+        return
+
     print(f"Load dataframe from {input_file}")
 
-    df = pd.read_csv(input_file)
+    df = _load(input_file)
 
     print("Check label column exists")
     if label_column not in df.columns:
         print(f"Could not find label column. Valid columns are {df.columns}")
         return 1
 
+    df[label_column] = df[label_column].astype("category")
+
     print("Check include/exclude labels exist")
 
     missing = 0
-    labels = df[label_column].unique()
-    
+    labels = set(df[label_column].unique())
+
     for lbl in set(include + exclude):
         if lbl not in labels:
             print(f"Could not find column {lbl} in dataframe.")
@@ -223,17 +715,25 @@ def merge(input_file, output_file,  label_column, include_list, exclude_list, ne
         return 1
 
     if len(include) > 0 and len(exclude) > 0:
-        idx = df[label_column].isin(include) and ~df[label_column].isin(exclude)
-    
+        # bitwise & for element-wise intersection; python's `and` raises on arrays
+        idx = _isin_codes(df[label_column], include) & ~_isin_codes(df[label_column], exclude)
     elif len(exclude) > 0:
-        idx =  ~df[label_column].isin(exclude)
+        idx = ~_isin_codes(df[label_column], exclude)
     elif len(include) > 0:
-        idx = df[label_column].isin(include)
+        idx = _isin_codes(df[label_column], include)
+
+    # rows with a missing label stay null rather than being renamed,
+    # matching the polars branch where a null condition never fires
+    idx &= df[label_column].notna().to_numpy()
+
+    # the new label has to exist as a category before it can be assigned
+    if new_label_name not in df[label_column].cat.categories:
+        df[label_column] = df[label_column].cat.add_categories([new_label_name])
 
     df.loc[idx, label_column] = new_label_name
 
     print(f"Saving updated labels to {output_file}")
-    df.to_csv(output_file)
+    _write(df, output_file, output_format)
 
 
 if __name__ == "__main__":